@@ -7,9 +7,231 @@ Created on Fri May 30 17:43:29 2025
 """
 
 
+from hashlib import sha1
+from importlib.util import find_spec
 from pathlib import Path
+import os
+import numpy as np
 import pandas as pd
 import data_access as dta
+from file_handler import EXCEL_ENGINE
+
+if find_spec('pyarrow'):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+else:
+    pa = pq = None
+
+
+CNPJ_PUNCTUATION = str.maketrans('', '', './-')
+
+# Parquet cache of the Excel sheets read here, kept out of the input folders.
+# Both values can be overridden through configure_excel_cache.
+DIR_EXCEL_CACHE = Path('./cache/excel/')
+EXCEL_CACHE_MAX_FILES = 256
+
+
+def configure_excel_cache(cache_dir=None, max_files=None) -> None:
+    """
+    Sets the folder and the maximum number of files of the parquet cache.
+    Entry points call it with the values from config_loader; process pools
+    call it again as initializer, since spawned workers do not inherit the
+    module state.
+
+    Args:
+        cache_dir (Path, optional): Cache folder. Keeps the current one if None.
+        max_files (int, optional): Files kept before the least recently used
+            ones are evicted. Keeps the current limit if None.
+
+    Raises:
+        ValueError: If max_files is smaller than 1.
+    """
+    global DIR_EXCEL_CACHE, EXCEL_CACHE_MAX_FILES
+
+    if cache_dir is not None:
+        DIR_EXCEL_CACHE = Path(cache_dir)
+    if max_files is not None:
+        if max_files < 1:
+            raise ValueError('max_files must be >= 1')
+        EXCEL_CACHE_MAX_FILES = max_files
+
+
+def excel_cache_settings() -> tuple:
+    """
+    Returns the current (cache_dir, max_files), suitable as initargs of
+    configure_excel_cache.
+    """
+    return DIR_EXCEL_CACHE, EXCEL_CACHE_MAX_FILES
+
+
+def _read_excel(file_path, **kwargs) -> pd.DataFrame:
+    """
+    Reads an Excel file with EXCEL_ENGINE; kwargs are forwarded to pd.read_excel.
+    """
+    return pd.read_excel(file_path, engine=EXCEL_ENGINE, **kwargs)
+
+
+def _parquet_cache_path(xlsx_path: Path, sheet_name=None, dtype=None) -> Path:
+    """
+    Builds the path of the parquet file that caches one sheet of a workbook.
+    A hash of the workbook's absolute path keeps workbooks with the same name
+    in different folders apart; the sheet name and the dtype mode keep
+    different reads of the same workbook apart.
+    """
+    parts = [xlsx_path.name, sha1(str(xlsx_path.resolve()).encode('utf-8')).hexdigest()[:16]]
+    if sheet_name is not None:
+        parts.append(sheet_name)
+    if dtype is str:
+        parts.append('str')
+    parts.append('parquet')
+
+    return DIR_EXCEL_CACHE / '.'.join(parts)
+
+
+def _source_fingerprint(xlsx_path: Path) -> dict:
+    """
+    Identifies the workbook version a cache was built from: exact mtime (ns)
+    and size, stored as parquet schema metadata.
+
+    Raises:
+        FileNotFoundError: If the workbook does not exist.
+    """
+    stat = xlsx_path.stat()
+    return {
+        b'source_mtime_ns': str(stat.st_mtime_ns).encode(),
+        b'source_size': str(stat.st_size).encode(),
+    }
+
+
+def _load_cache(xlsx_path: Path, fingerprint: dict, sheet_name=None, dtype=None):
+    """
+    Returns the cached sheet when its stored fingerprint matches the
+    workbook exactly, otherwise None.
+    """
+    cache_path = _parquet_cache_path(xlsx_path, sheet_name, dtype)
+    if pq is None or not cache_path.exists():
+        return None
+
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowException):
+        return None
+
+    if any(metadata.get(key) != value for key, value in fingerprint.items()):
+        return None
+
+    try:
+        dtfrm = pd.read_parquet(cache_path)
+        # marca o uso para a politica LRU de _evict_cache
+        os.utime(cache_path)
+    except (OSError, pa.ArrowException):
+        # evicted by another process between the checks above and the read
+        return None
+
+    # pyarrow devolve None para texto ausente em colunas object, read_excel
+    # devolve NaN; sem isso .astype(str) daria 'None' no cache e 'nan' no Excel
+    for col in dtfrm.columns[dtfrm.dtypes == object]:
+        dtfrm[col] = dtfrm[col].where(dtfrm[col].notna(), np.nan)
+
+    return dtfrm
+
+
+def _evict_cache() -> None:
+    """
+    Keeps at most EXCEL_CACHE_MAX_FILES parquet files in the cache folder,
+    removing the least recently used ones (by mtime, refreshed on every hit).
+    """
+    entries = []
+    for cache_path in DIR_EXCEL_CACHE.glob('*.parquet'):
+        try:
+            entries.append((cache_path.stat().st_mtime_ns, cache_path))
+        except FileNotFoundError:
+            continue
+
+    if len(entries) <= EXCEL_CACHE_MAX_FILES:
+        return
+
+    entries.sort()
+    for _, cache_path in entries[:len(entries) - EXCEL_CACHE_MAX_FILES]:
+        cache_path.unlink(missing_ok=True)
+
+
+def _store_cache(dtfrm, xlsx_path: Path, fingerprint: dict, sheet_name=None, dtype=None):
+    """
+    Writes the parquet cache of one sheet tagged with the workbook
+    fingerprint. Failing to write it (read-only folder, missing pyarrow,
+    column types parquet cannot represent) is not an error: the caller
+    already has the data read from Excel.
+    """
+    if pq is None:
+        return
+
+    cache_path = _parquet_cache_path(xlsx_path, sheet_name, dtype)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(dtfrm)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **fingerprint})
+        pq.write_table(table, tmp_path, compression='zstd')
+        tmp_path.replace(cache_path)
+        _evict_cache()
+    except (OSError, TypeError, ValueError, pa.ArrowException):
+        tmp_path.unlink(missing_ok=True)
+
+
+def _read_cached(xlsx_path, sheet_name=None, dtype=None) -> pd.DataFrame:
+    """
+    Reads an Excel sheet through its parquet cache, parsing the workbook
+    and rewriting the cache only when the cache is missing or was built
+    from a different version of the workbook.
+
+    Args:
+        xlsx_path (str | Path): Path to the .xlsx file.
+        sheet_name (str, optional): Sheet to read. Defaults to the first one.
+        dtype (type, optional): None or str, forwarded to read_excel.
+
+    Returns:
+        pd.DataFrame: Sheet contents.
+
+    Raises:
+        FileNotFoundError: If the workbook does not exist.
+    """
+    xlsx_path = Path(xlsx_path)
+    fingerprint = _source_fingerprint(xlsx_path)
+
+    dtfrm = _load_cache(xlsx_path, fingerprint, sheet_name, dtype)
+    if dtfrm is None:
+        dtfrm = _read_excel(xlsx_path, sheet_name=sheet_name or 0, dtype=dtype)
+        _store_cache(dtfrm, xlsx_path, fingerprint, sheet_name, dtype)
+
+    return dtfrm
+
+
+def _read_cached_sheets(xlsx_path: Path, sheet_names, dtype=None) -> dict:
+    """
+    Reads several sheets of one workbook through the parquet cache. The
+    workbook is opened once, and only if some sheet is not cached; the
+    handle is closed before returning so the file is not kept locked.
+
+    Args:
+        xlsx_path (Path): Path to the .xlsx file.
+        sheet_names (Iterable[str]): Sheets to read.
+        dtype (type, optional): None or str, forwarded to ExcelFile.parse.
+
+    Returns:
+        dict[str, pd.DataFrame]: Sheet contents by sheet name.
+    """
+    fingerprint = _source_fingerprint(xlsx_path)
+    sheets = {name: _load_cache(xlsx_path, fingerprint, name, dtype) for name in sheet_names}
+    missing = [name for name, dtfrm in sheets.items() if dtfrm is None]
+
+    if missing:
+        with pd.ExcelFile(xlsx_path, engine=EXCEL_ENGINE) as xls:
+            for name in missing:
+                sheets[name] = xls.parse(sheet_name=name, dtype=dtype)
+                _store_cache(sheets[name], xlsx_path, fingerprint, name, dtype)
+
+    return sheets
 
 
 def convert_column_types(dtfrm, dtype_map):
@@ -61,15 +283,17 @@ def load_assets_aux(data_aux_path: Path) -> pd.DataFrame:
         cols = table['cols']
 
         cols_names = dta.read(f"{table_name}_columns")
-        dtypes = dta.read(f"{table_name}_dtypes")
+        dtypes = {col: tipo for col, tipo in dta.read(f"{table_name}_dtypes").items()
+                  if col in cols}
 
         table_aux = pd.read_csv(data_aux_path / f"{table_name.upper()}.TXT",
                                 header=None,
                                 names=cols_names,
+                                usecols=cols,
                                 encoding='utf-8',
-                                dtype=str)
+                                dtype=str)[cols]
         convert_column_types(table_aux, dtypes)
-        aux_tables.append(table_aux[cols])
+        aux_tables.append(table_aux)
 
     numeraca = aux_tables[0]
     emissor = aux_tables[1]
@@ -78,7 +302,8 @@ def load_assets_aux(data_aux_path: Path) -> pd.DataFrame:
         emissor.add_prefix('fEMISSOR.'),
         left_on='fNUMERACA.COD_EMISSOR',
         right_on='fEMISSOR.COD_EMISSOR',
-        how='left'
+        how='left',
+        validate='many_to_one'
     )
 
 
@@ -99,17 +324,12 @@ def load_db_cad_fi_cvm(data_aux_path: Path) -> pd.DataFrame:
 
     db_cad_fi_cvm = db_cad_fi_cvm[db_cad_fi_cvm['SIT'] == 'EM FUNCIONAMENTO NORMAL']
 
-    db_cad_fi_cvm['CNPJ_FUNDO'] = (
-        db_cad_fi_cvm['CNPJ_FUNDO']
-        .str.replace('.', '', regex=False)
-        .str.replace('/', '', regex=False)
-        .str.replace('-', '', regex=False)
-    )
-
     cols_date = ['DT_REG', 'DT_CONST', 'DT_CANCEL', 'DT_INI_SIT', 'DT_INI_ATIV',
                  'DT_INI_EXERC', 'DT_FIM_EXERC', 'DT_PATRIM_LIQ']
     for col in cols_date:
-        db_cad_fi_cvm[col] = pd.to_datetime(db_cad_fi_cvm[col], errors='raise')
+        db_cad_fi_cvm[col] = pd.to_datetime(db_cad_fi_cvm[col], format='%Y-%m-%d', errors='raise')
+
+    db_cad_fi_cvm['CNPJ_FUNDO'] = db_cad_fi_cvm['CNPJ_FUNDO'].str.translate(CNPJ_PUNCTUATION)
 
     db_cad_fi_cvm['CD_CVM'] = pd.to_numeric(
         db_cad_fi_cvm['CD_CVM'],
@@ -159,7 +379,7 @@ def load_returns_by_puposicao(data_aux_path):
     returns_path = data_aux_path / 'isin_rentab.xlsx'
 
     try:
-        returns_by_puposicao = pd.read_excel(returns_path, dtype=str)
+        returns_by_puposicao = _read_cached(returns_path, dtype=str)
     except FileNotFoundError:
         returns_by_puposicao = pd.DataFrame({
             'isin': pd.Series(dtype='str'),
@@ -183,13 +403,13 @@ def load_mecsac_file(file_path: str) -> pd.DataFrame:
     """
     columns = ['CLCLI_CD', 'DT', 'VL_PATRLIQTOT1', 'CODCLI', 'NOME',
                'compute_0015', 'compute_0016', 'compute_0017']
-    mec_sac = pd.read_excel(file_path)
+    mec_sac = _read_cached(file_path)
 
     if mec_sac.empty:
         print(f"Empty mecSAC file: {file_path}")
         return pd.DataFrame()
 
-    mec_sac['DT'] = pd.to_datetime(mec_sac['DT'], dayfirst=True)
+    mec_sac['DT'] = pd.to_datetime(mec_sac['DT'], format='%d/%m/%Y', cache=True)
 
     result = mec_sac[columns].copy()
 
@@ -216,16 +436,17 @@ def load_mec_sac_last_day_month(file_path: str) -> pd.DataFrame:
                       of each month per CODCLI.
     """
     mec_sac = load_mecsac_file(file_path)
+    if mec_sac.empty:
+        return mec_sac
+
     mec_sac['year_month'] = mec_sac['DT'].dt.to_period('M').dt.to_timestamp()
 
-    idx = (
+    return (
         mec_sac
-        .groupby(['CODCLI', 'year_month'])['DT']
-        .idxmax()
+        .sort_values('DT', ascending=False, kind='stable')
+        .drop_duplicates(subset=['CODCLI', 'year_month'], keep='first')
     )
 
-    return mec_sac.loc[idx].copy()
-
 
 def load_cnpb_codcli_mapping(data_aux_path):
     """
@@ -242,8 +463,9 @@ def load_cnpb_codcli_mapping(data_aux_path):
     pd.DataFrame
         DataFrame with columns ['CNPB', 'CODCLI_SAC'].
     """
-    dcadplano = pd.read_excel(data_aux_path / 'dbAux.xlsx', sheet_name='dCadPlano')
-    dcadplanosac = pd.read_excel(data_aux_path / 'dbAux.xlsx', sheet_name='dCadPlanoSAC')
+    sheets = _read_cached_sheets(data_aux_path / 'dbAux.xlsx', ['dCadPlano', 'dCadPlanoSAC'])
+    dcadplano = sheets['dCadPlano']
+    dcadplanosac = sheets['dCadPlanoSAC']
 
     dcadplano['COD_PLANO'] = dcadplano['COD_PLANO'].astype(str).str.strip()
     dcadplanosac['COD_PLANO'] = dcadplanosac['COD_PLANO'].astype(str).str.strip()
@@ -256,7 +478,8 @@ def load_cnpb_codcli_mapping(data_aux_path):
     mapping = dcadplano.merge(
         dcadplanosac,
         on='COD_PLANO',
-        how='inner'
+        how='inner',
+        validate='one_to_many'
     )
 
     diffs = mapping.loc[mapping['CNPB_x'] != mapping['CNPB_y'], ['COD_PLANO', 'CNPB_x', 'CNPB_y']]
@@ -272,7 +495,7 @@ def load_performance(file_path: str) -> pd.DataFrame:
     performance = pd.DataFrame()
 
     try:
-        performance = pd.read_excel(file_path, sheet_name='Resumo', header=None)
+        performance = _read_excel(file_path, sheet_name='Resumo', header=None)
     except Exception as excp:
         print('')
         print(f"Erro ao abrir o arquivo {file_path}")
@@ -331,11 +554,7 @@ def load_dbaux(data_aux_path: Path) -> dict:
 
     dbaux_path = data_aux_path / 'dbAux.xlsx'
 
-    sheets = pd.read_excel(
-        dbaux_path,
-        sheet_name=list(mapping.values()),
-        dtype=str
-    )
+    sheets = _read_cached_sheets(dbaux_path, mapping.values(), dtype=str)
 
     dcadplanosac = sheets['dCadPlanoSAC'].copy()
     dcadplanosac['CODCLI_SAC'] = dcadplanosac['CODCLI_SAC_INVEST'].where(
@@ -7,6 +7,7 @@ Created on Fri May 30 17:26:10 2025
 """
 
 
+import numpy as np
 import pandas as pd
 
 
@@ -45,28 +46,27 @@ def explode_partplanprev_and_allocate(portfolios):
       the actual underlying assets of the portfolio to compute proportional values.
     - This process effectively expands the data structure by creating new rows.
     """
-    if portfolios[portfolios['tipo'] == 'partplanprev'].empty:
+    mask_partplanprev = (portfolios['tipo'] == 'partplanprev').to_numpy()
+
+    if not mask_partplanprev.any():
         return None
 
-    partplanprev = portfolios[portfolios['tipo'] == 'partplanprev'][
-        ['codcart', 'nome', 'percpart', 'cnpb', 'dtposicao']
+    partplanprev = portfolios.loc[
+        mask_partplanprev, ['codcart', 'nome', 'percpart', 'cnpb', 'dtposicao']
     ]
 
-    assets_to_allocate = portfolios[
-        ~portfolios['tipo'].isin(['partplanprev'])
-    ].drop(columns=['cnpb', 'percpart'])
+    assets_to_allocate = portfolios.loc[~mask_partplanprev].drop(columns=['cnpb', 'percpart'])
 
-    assets_to_allocate = assets_to_allocate.copy()
     assets_to_allocate['original_index'] = assets_to_allocate.index
 
     allocated_assets = partplanprev.merge(
         assets_to_allocate.dropna(subset=['valor_calc']),
         on=['codcart', 'nome', 'dtposicao'],
-        how='inner'
+        how='inner',
+        validate='many_to_many'
     )
 
     allocated_assets['percpart'] = pd.to_numeric(allocated_assets['percpart'], errors='raise')
-    allocated_assets['valor_calc'] = pd.to_numeric(allocated_assets['valor_calc'], errors='raise')
 
     allocated_assets['valor_calc'] = (
         allocated_assets['percpart'] * allocated_assets['valor_calc'] / 100.0
@@ -79,7 +79,7 @@ def explode_partplanprev_and_allocate(portfolios):
         allocated_assets.loc[mask_cotas, 'qtdisponivel'] / 100.0
     )
 
-    allocated_assets['flag_rateio'] = 0
+    allocated_assets['flag_rateio'] = np.int8(0)
 
     return allocated_assets
 
@@ -101,9 +101,10 @@ def integrate_allocated_partplanprev(entity, allocated_partplanprev):
     Returns:
         pd.DataFrame: The updated DataFrame with new rows and adjusted flags/values.
     """
-    entity['flag_rateio'] = entity.index.isin(
-        allocated_partplanprev['original_index'].unique()
-    ).astype(int)
+    flagged = np.isin(
+        entity.index.to_numpy(), allocated_partplanprev['original_index'].to_numpy()
+    )
+    entity['flag_rateio'] = flagged.astype(np.int8)
 
     entity = pd.concat([entity, allocated_partplanprev], ignore_index=True)
     entity['valor_calc'] = entity['valor_calc'].where(entity['flag_rateio'] != 1, 0)
@@ -7,7 +7,9 @@ Created on Fri Jan  3 16:31:03 2025
 """
 
 
-import inspect
+import ast
+import sys
+import numpy as np
 import pandas as pd
 
 
@@ -41,13 +43,17 @@ def harmonize_values(dtfr, harmonization_rules):
 
     Formula Handling:
     -----------------
-    - If `formula` is a string: It is evaluated as a pandas expression using the `eval` function.
+    - If `formula` is a string: It is evaluated with `pd.eval` over the matching rows only.
     - If `formula` is a list: The specified columns are summed across rows.
     - If `formula` is a constant: The value is directly assigned to the `valor` column.
 
     Notes:
     ------
-    - Rows not matching any rule will retain `None` or their original value in the `valor` column.
+    - `valor_calc` is created as a float64 column of zeros, so rows not matching any rule
+      keep 0.0 and every assignment stays on the numeric path.
+    - Each row takes the formula of the last rule whose filters match it. Rules are
+      resolved per set of filter columns in one pass, and a formula is only evaluated
+      when its rule is the one applied to at least one row.
     - Warnings are printed if any filter references columns missing from the DataFrame.
 
     Example:
@@ -66,37 +72,144 @@ def harmonize_values(dtfr, harmonization_rules):
     1   cotas    200  180.0
     2   caixa    300  330.0
     """
-    dtfr['valor_calc'] = 0.0
+    rules = list(harmonization_rules.items())
+    rules_by_columns = {}
 
-    for key, value in harmonization_rules.items():
+    for position, (key, value) in enumerate(rules):
         try:
-            filters = value["filters"]
-            formula = value["formula"]
+            filter_columns = tuple(filter_item['column'] for filter_item in value["filters"])
+            filter_values = tuple(filter_item['value'] for filter_item in value["filters"])
 
-            filter_columns = [filter_item['column'] for filter_item in filters]
+            validate_required_columns(dtfr, list(filter_columns))
+        except Exception as excpt:
+            raise ValueError(
+                f"[harmonize_values] Erro ao aplicar fórmula na regra '{key}': {excpt}"
+            ) from excpt
+
+        rules_by_columns.setdefault(filter_columns, {})[filter_values] = position
 
-            validate_required_columns(dtfr, filter_columns)
+    # Position of the rule applied to each row; later rules override earlier
+    # ones, so every bucket of filter columns keeps the highest position.
+    rule_by_row = np.full(len(dtfr), -1, dtype=np.intp)
+    factorized = {}
+    for filter_columns, rule_by_values in rules_by_columns.items():
+        matched = _match_rules(dtfr, filter_columns, rule_by_values, factorized)
+        np.maximum(rule_by_row, matched, out=rule_by_row)
 
-            mask = pd.Series(True, index=dtfr.index)
-            for filter_item in filters:
-                column, filter_value = filter_item['column'], filter_item['value']
-                mask &= (dtfr[column] == filter_value)
+    valor_calc = np.zeros(len(dtfr), dtype='float64')
 
-            if sum(mask) == 0:
-                continue
+    for position in np.unique(rule_by_row[rule_by_row >= 0]):
+        key, value = rules[position]
+        formula = value["formula"]
+        rows = rule_by_row == position
 
+        try:
             if isinstance(formula, str):
-                formula_expr = formula
-                dtfr.loc[mask, 'valor_calc'] = dtfr.loc[mask].eval(formula_expr)
+                valor_calc[rows] = _eval_formula(dtfr, formula, rows)
             elif isinstance(formula, list):
-                dtfr.loc[mask, 'valor_calc'] = dtfr.loc[mask, formula].sum(axis=1)
+                valor_calc[rows] = _sum_columns(dtfr, formula, rows)
             else:
-                dtfr.loc[mask, 'valor_calc'] = formula
+                valor_calc[rows] = float(formula)
         except Exception as excpt:
             raise ValueError(
                 f"[harmonize_values] Erro ao aplicar fórmula na regra '{key}': {excpt}"
             ) from excpt
 
+    dtfr['valor_calc'] = valor_calc
+
+
+def _eval_formula(dtfr, formula, rows):
+    """
+    Evaluates a string formula only over the selected rows.
+
+    The column names referenced by the formula are taken from its syntax tree
+    and passed to pd.eval as plain float64 arrays, so neither a sub-frame nor a
+    full-length result is materialized (pd.eval uses numexpr when installed).
+
+    Args:
+        dtfr (pd.DataFrame): DataFrame being harmonized.
+        formula (str): Arithmetic expression over column names.
+        rows (np.ndarray): Boolean mask of the rows the formula applies to.
+
+    Returns:
+        np.ndarray: float64 result for the selected rows.
+    """
+    names = {node.id for node in ast.walk(ast.parse(formula, mode='eval'))
+             if isinstance(node, ast.Name) and node.id in dtfr.columns}
+    local_dict = {
+        name: dtfr[name].to_numpy(dtype='float64', na_value=np.nan)[rows] for name in names
+    }
+    result = np.asarray(pd.eval(formula, local_dict=local_dict), dtype='float64')
+
+    return np.broadcast_to(result, (int(rows.sum()),))
+
+
+def _sum_columns(dtfr, columns, rows):
+    """
+    Row-wise sum of the given columns over the selected rows, skipping NaN
+    like DataFrame.sum(axis=1) (a row with only NaN sums to 0.0).
+
+    Args:
+        dtfr (pd.DataFrame): DataFrame being harmonized.
+        columns (list): Columns to add up.
+        rows (np.ndarray): Boolean mask of the rows the formula applies to.
+
+    Returns:
+        np.ndarray: float64 sums for the selected rows.
+    """
+    if not columns:
+        return 0.0
+
+    block = np.column_stack(
+        [dtfr[column].to_numpy(dtype='float64', na_value=np.nan)[rows] for column in columns]
+    )
+
+    return np.nansum(block, axis=1)
+
+
+def _match_rules(dtfr, filter_columns, rule_by_values, factorized):
+    """
+    Resolves, for rules sharing the same filter columns, which rule matches
+    each row.
+
+    Each filter column is factorized once and kept in `factorized`. The codes
+    of the bucket columns are combined into a single key per row, which indexes
+    a small table holding the rule position for every filter-value tuple.
+
+    Args:
+        dtfr (pd.DataFrame): DataFrame being harmonized.
+        filter_columns (tuple): Filter columns shared by the rules.
+        rule_by_values (dict): Filter-value tuple -> rule position.
+        factorized (dict): Cache of column -> (codes, {value: code}).
+
+    Returns:
+        np.ndarray: Rule position per row, -1 where no rule of the bucket matches.
+    """
+    if not filter_columns:
+        return np.full(len(dtfr), max(rule_by_values.values()), dtype=np.intp)
+
+    for column in filter_columns:
+        if column not in factorized:
+            codes, uniques = pd.factorize(dtfr[column])
+            factorized[column] = (codes, {value: code for code, value in enumerate(uniques)})
+
+    shape = tuple(len(factorized[column][1]) for column in filter_columns)
+    if 0 in shape:
+        return np.full(len(dtfr), -1, dtype=np.intp)
+
+    table = np.full(np.prod(shape), -1, dtype=np.intp)
+    for filter_values, position in rule_by_values.items():
+        value_codes = [factorized[column][1].get(filter_value)
+                       for column, filter_value in zip(filter_columns, filter_values)]
+        if None not in value_codes:
+            table[np.ravel_multi_index(value_codes, shape)] = position
+
+    codes = [factorized[column][0] for column in filter_columns]
+    valid = np.logical_and.reduce([column_codes >= 0 for column_codes in codes])
+    keys = np.ravel_multi_index([np.maximum(column_codes, 0) for column_codes in codes], shape)
+
+    return np.where(valid, table[keys], -1)
+
 
 def validate_required_columns(dtfrm: pd.DataFrame, required_columns: list):
     """
@@ -110,12 +223,22 @@ def validate_required_columns(dtfrm: pd.DataFrame, required_columns: list):
     Raises:
         ValueError: If one or more required columns are missing.
     """
-    missing_columns = [col for col in required_columns if col not in dtfrm.columns]
+    available = set(dtfrm.columns)
+    missing_columns = [col for col in required_columns if col not in available]
     if missing_columns:
-        caller_name = inspect.stack()[1].function
+        caller_name = sys._getframe(1).f_code.co_name
         raise ValueError(f"[{caller_name}] Missing required columns: {', '.join(missing_columns)}")
 
 
+def _isin_codes(codes, uniques, values):
+    """
+    Equivalent of Series.isin computed on factorized codes: the membership
+    test runs over the distinct values only and is then gathered by code.
+    Missing values (code -1) map to the trailing False.
+    """
+    return np.append(uniques.isin(values), False)[codes]
+
+
 def clean_data(raw, dtypes, types_to_exclude, types_series, harmonization_rules):
     """
     Aplica limpeza e harmonização aos dados de uma entidade (fundos ou carteiras).
@@ -129,21 +252,32 @@ def clean_data(raw, dtypes, types_to_exclude, types_series, harmonization_rules)
     Returns:
         pd.DataFrame: DataFrame limpo e harmonizado.
     """
-    valid_dtypes = {col: dtype for col, dtype in dtypes.items() if col in raw.columns}
+    to_cast = {
+        col: dtype for col, dtype in dtypes.items()
+        if col in raw.columns and raw[col].dtype != pd.api.types.pandas_dtype(dtype)
+    }
 
-    raw = raw.astype(valid_dtypes, errors='raise')
+    if to_cast:
+        raw = raw.astype(to_cast, errors='raise')
 
-    raw = raw[~raw['tipo'].isin(types_to_exclude)]
+    tipo_codes, tipo_uniques = pd.factorize(raw['tipo'])
+    keep = ~_isin_codes(tipo_codes, tipo_uniques, types_to_exclude)
+    raw = raw[keep]
+    tipo_codes = tipo_codes[keep]
 
     harmonize_values(raw, harmonization_rules)
 
-    raw['valor_serie'] = raw['valor'].where(raw['tipo'].isin(types_series), 0)
-    raw['valor_calc'] = raw['valor_calc'].where(~raw['tipo'].isin(types_series), 0)
+    series_mask = _isin_codes(tipo_codes, tipo_uniques, types_series)
+    valor_serie = np.where(series_mask, raw['valor'].to_numpy(), 0.0)
+    valor_calc = np.where(series_mask, 0.0, raw['valor_calc'].to_numpy())
+
+    raw['valor_serie'] = valor_serie
+    raw['valor_calc'] = valor_calc
 
     mask = (
-        (raw['valor_serie'] != 0)
-        | (raw['valor_calc'] != 0)
-        | (raw['tipo'] == 'partplanprev')
+        (valor_serie != 0)
+        | (valor_calc != 0)
+        | _isin_codes(tipo_codes, tipo_uniques, ['partplanprev'])
     )
 
     return raw[mask].copy()
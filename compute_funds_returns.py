@@ -8,9 +8,11 @@ Created on Sun May 18 10:26:59 2025
 
 
 import os
+import numpy as np
 import pandas as pd
 import util as utl
 import data_access as dta
+from file_handler import load_df
 
 
 def compute_returns_from_puposicao(investor: pd.DataFrame) -> pd.DataFrame:
@@ -34,7 +36,18 @@ def compute_returns_from_puposicao(investor: pd.DataFrame) -> pd.DataFrame:
     isin_returns = investor[investor['cnpjfundo'].notnull()][group_cols].drop_duplicates()
 
     isin_returns.sort_values(by=['cnpjfundo', 'dtposicao'], inplace=True)
-    isin_returns['rentab'] = isin_returns.groupby('cnpjfundo')['puposicao'].pct_change()
+
+    # pct_change por cnpjfundo em uma unica passada: com as linhas ordenadas,
+    # cada linha so tem retorno se a anterior for do mesmo fundo.
+    codes, _ = pd.factorize(isin_returns['cnpjfundo'])
+    puposicao = isin_returns['puposicao'].to_numpy(dtype='float64', na_value=np.nan)
+
+    rentab = np.full(len(puposicao), np.nan)
+    same_fund = codes[1:] == codes[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rentab[1:][same_fund] = puposicao[1:][same_fund] / puposicao[:-1][same_fund] - 1
+
+    isin_returns['rentab'] = rentab
 
     return isin_returns[['cnpjfundo', 'dtposicao', 'rentab']]
 
@@ -43,7 +56,8 @@ def main():
     """
     Main function for processing fund and portfolio data:
     - Reads configuration settings.
-    - Loads funds and portfolios data from Excel files.
+    - Loads funds and portfolios data in the [Paths] destination_file_extension
+      format (defaults to xlsx).
     - Computes returns
     - Saves processed data back to Excel files.
     """
@@ -51,15 +65,18 @@ def main():
 
     xlsx_destination_path = config['Paths']['xlsx_destination_path']
     xlsx_destination_path = f"{os.path.dirname(utl.format_path(xlsx_destination_path))}/"
+    file_format = config['Paths'].get('destination_file_extension', 'xlsx').strip()
 
     entities = ['fundos', 'carteiras']
+    columns = ['cnpjfundo', 'dtposicao', 'puposicao']
 
     results = []
 
     for entity_name in entities:
         dtypes = dta.read(f"{entity_name}_metadata")
 
-        entity = pd.read_excel(f"{xlsx_destination_path}{entity_name}.xlsx", dtype=dtypes)
+        entity = load_df(f"{xlsx_destination_path}{entity_name}", file_format,
+                         dtype=dtypes, columns=columns)
 
         cnpjfundo_returns = compute_returns_from_puposicao(entity)
 
@@ -75,4 +92,5 @@ def main():
 
 
 if __name__ == "__main__":
+    utl.enable_copy_on_write()
     main()
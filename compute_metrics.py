@@ -7,6 +7,7 @@ Created on Thu May 15 10:42:26 2025
 """
 
 
+import numpy as np
 import pandas as pd
 
 
@@ -50,47 +51,65 @@ def compute_composition(investor, group_keys, types_to_exclude):
     return composition
 
 
-def compute_equity_stake(investor_holdings, invested):
+def build_patliq_lookup(invested):
     """
-    Calculate the equity stake of investors based on available quotas and fund values.
+    Builds the fund net worth lookup used by compute_equity_stake.
 
     Args:
-        investor_holdings (pd.DataFrame): DataFrame containing investor positions,
-            with required columns: 'cnpjfundo', 'valor_calc', and 'dtposicao'.
         invested (pd.DataFrame): DataFrame containing fund value data,
             with required columns: 'cnpj', 'valor', 'dtposicao' and a 'tipo' column
-            (must be equal to 'quantidade' for inclusion).
+            (must be equal to 'patliq' for inclusion).
 
     Returns:
-        pd.DataFrame: A DataFrame with the calculated 'equity_stake' per investor
-            position, indexed by the original investor_holdings index.
+        pd.Series: 'valor' of the 'patliq' rows indexed by (cnpj, dtposicao).
+    """
+    patliq = invested.loc[invested['tipo'] == 'patliq', ['cnpj', 'dtposicao', 'valor']]
+    patliq = patliq.drop_duplicates(subset=['cnpj', 'dtposicao'], keep='last')
+
+    return patliq.set_index(['cnpj', 'dtposicao'])['valor']
+
+
+def compute_equity_stake(investor_holdings, patliq_lookup):
     """
-    investor_holdings['original_index'] = investor_holdings.index
+    Calculate the equity stake of investors based on available quotas and fund values.
 
-    columns_invested = ['cnpj', 'valor', 'dtposicao']
+    The fund net worth is looked up by (cnpjfundo, dtposicao) through a
+    MultiIndex reindex instead of merging both frames.
 
-    equity_stake = investor_holdings.merge(
-        invested[invested['tipo'] == 'patliq'][columns_invested],
-        left_on=['cnpjfundo', 'dtposicao'],
-        right_on=['cnpj', 'dtposicao'],
-        how='inner'
+    Args:
+        investor_holdings (pd.DataFrame): DataFrame containing investor positions,
+            with required columns: 'cnpjfundo', 'valor_calc', and 'dtposicao'.
+        patliq_lookup (pd.Series): Fund net worth as built by build_patliq_lookup.
+
+    Returns:
+        pd.Series: The 'equity_stake' per investor position that has a matching
+            fund net worth, indexed by the original investor_holdings index.
+            Positions in a fund with zero net worth get NaN instead of inf.
+    """
+    keys = pd.MultiIndex.from_arrays(
+        [investor_holdings['cnpjfundo'], investor_holdings['dtposicao']]
     )
+    valor = patliq_lookup.reindex(keys).to_numpy(dtype='float64', na_value=np.nan)
+    matched = ~np.isnan(valor)
 
-    equity_stake.set_index('original_index', inplace=True)
+    valor = valor[matched]
+    valor_calc = investor_holdings['valor_calc'].to_numpy(dtype='float64', na_value=np.nan)
 
-    equity_stake['equity_stake'] = equity_stake['valor_calc'] / equity_stake['valor']
+    equity_stake = np.full(len(valor), np.nan)
+    np.divide(valor_calc[matched], valor, out=equity_stake, where=valor != 0)
 
-    return equity_stake
+    return pd.Series(equity_stake, index=investor_holdings.index[matched],
+                     name='equity_stake', dtype='float64')
 
 
-def compute(entity, invested, types_series, composition_group_keys):
+def compute(entity, patliq_lookup, types_series, composition_group_keys):
     """
     Main function for processing fund and portfolio data:
-    - Computes equity stake
+    - Computes equity stake against patliq_lookup (see build_patliq_lookup)
     """
     investor_holdings_cols = ['cnpjfundo', 'valor_calc', 'dtposicao']
 
-    investor_holdings = entity[entity['cnpjfundo'].notnull()][investor_holdings_cols].copy()
+    investor_holdings = entity.loc[entity['cnpjfundo'].notna().to_numpy(), investor_holdings_cols]
 
-    equity_stake = compute_equity_stake(investor_holdings, invested)
-    entity.loc[equity_stake.index, 'equity_stake'] = equity_stake['equity_stake']
+    equity_stake = compute_equity_stake(investor_holdings, patliq_lookup)
+    entity.loc[equity_stake.index, 'equity_stake'] = equity_stake
@@ -126,6 +126,15 @@ def _parse_workers(value: str | None) -> int | None:
     return n
 
 
+def _parse_cache_max_files(value: str | None) -> int:
+    if value is None or not value.strip():
+        return 256
+    n = int(value.strip())
+    if n < 1:
+        raise ValueError("Processing.cache_max_files must be >= 1")
+    return n
+
+
 def load_settings(config_file: str | Path = 'config.ini') -> dict[str, Any]:
     """
     Unified config loader for Sofia.
@@ -154,6 +163,7 @@ def load_settings(config_file: str | Path = 'config.ini') -> dict[str, Any]:
         'custodia_path': _resolve_path(config['InputPaths']['custodia_path'], config_file=cfg_path, want_dir=True),
         'destination_path': _resolve_path(config['OutputPaths']['destination_path'], config_file=cfg_path, want_dir=True),
         'destination_file_format': config['OutputFormats']['destination_file_format'].strip(),
+        'cache_path': _resolve_path(config['OutputPaths'].get('cache_path') or './cache/excel/', config_file=cfg_path, want_dir=True),
     }
 
     debug = {
@@ -164,6 +174,7 @@ def load_settings(config_file: str | Path = 'config.ini') -> dict[str, Any]:
 
     processing = {
         'workers': _parse_workers(config['Processing'].get('workers')),
+        'cache_max_files': _parse_cache_max_files(config['Processing'].get('cache_max_files')),
     }
 
     log_cfg = {
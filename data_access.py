@@ -9,6 +9,7 @@ Created on Wed Jan  8 17:39:16 2025
 
 import json
 import os
+from functools import lru_cache
 
 
 DIR_SYS_DATA = './sys_data/'
@@ -55,10 +56,14 @@ def _save_json_file(file_name, values):
         json.dump(values, file, indent=4)
 
 
+@lru_cache(maxsize=None)
 def read(table_name):
     """
     Reads a table (JSON file) from the DIR_SYS_DATA directory.
 
+    The parsed content is cached per process and the cache is cleared by
+    create/create_if_not_exists; callers must not mutate the returned object.
+
     Args:
         table_name (str): The name of the table (file) to read.
 
@@ -77,6 +82,7 @@ def create(table_name, values):
         values (dict): The data to be written to the JSON file.
     """
     _save_json_file(table_name, values)
+    read.cache_clear()
 
 
 def create_if_not_exists(table_name, values):
@@ -90,6 +96,7 @@ def create_if_not_exists(table_name, values):
     file_path = os.path.join(DIR_SYS_DATA, f"{table_name}.json")
     if not os.path.exists(file_path):
         _save_json_file(table_name, values)
+        read.cache_clear()
 
 
 # Initialization: Create the DIR_SYS_DATA directory when the module is loaded
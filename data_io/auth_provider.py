@@ -16,7 +16,21 @@ Does not contain or depend on any business-specific API logic.
 
 
 import time
-import requests
+from .http_retry import new_retry_session
+
+
+def _new_token_session():
+    """
+    Create the HTTP session used for token requests.
+
+    The session keeps the connection to the token endpoint alive between
+    refreshes and uses the data_io retry policy (see http_retry). The token
+    request is safe to repeat, so POST is the retried method here.
+
+    Returns:
+        requests.Session: Session with the retrying adapter mounted on https.
+    """
+    return new_retry_session(allowed_methods={"POST"})
 
 
 def new_auth_context(tenant_id, client_id, client_secret, scope, **opts):
@@ -41,6 +55,7 @@ def new_auth_context(tenant_id, client_id, client_secret, scope, **opts):
         "scope": scope,
         "_token": None,
         "_token_exp": 0,
+        "_sess": _new_token_session(),
         "timeout": opts.get("timeout", 300),
     }
 
@@ -65,7 +80,7 @@ def _refresh_token(ctx):
         "client_secret": ctx["client_secret"],
         "scope": ctx["scope"],
     }
-    resp = requests.post(ctx["token_url"], data=data, timeout=ctx["timeout"])
+    resp = ctx["_sess"].post(ctx["token_url"], data=data, timeout=ctx["timeout"])
     resp.raise_for_status()
     payload = resp.json()
     ctx["_token"] = payload["access_token"]
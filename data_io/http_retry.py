@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retry policy shared by the HTTP sessions of data_io.
+
+Transient failures (throttling and 5xx) are retried with backoff. Read
+timeouts are not retried and connection failures only once, so a request
+waits at most ~2x the caller's timeout. When the status retries run out the
+last response is returned, so raise_for_status still raises
+requests.HTTPError.
+"""
+
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def new_retry_session(allowed_methods=SAFE_METHODS):
+    """
+    Create an HTTP session with the retrying adapter mounted on https.
+
+    Args:
+        allowed_methods (Iterable[str]): HTTP methods that may be retried.
+            Only include methods whose repetition is harmless.
+
+    Returns:
+        requests.Session: Session with the retry policy mounted on https.
+    """
+    retry = Retry(
+        total=3,
+        connect=1,
+        read=0,
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset(allowed_methods),
+        raise_on_status=False,
+    )
+    sess = requests.Session()
+    sess.mount("https://", HTTPAdapter(max_retries=retry))
+    return sess
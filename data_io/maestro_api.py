@@ -22,12 +22,18 @@ Typical usage:
 
 import json
 import requests
+from .http_retry import new_retry_session
 
 
 def new_api_context(api_base, auth_header_provider, **opts):
     """
     Create a new API context.
 
+    The session uses the data_io retry policy (see http_retry) for GET only.
+    POST creates entities in Maestro and DELETE removes them: repeating one
+    that failed with 5xx after being processed would duplicate the entity or
+    turn the retry into a 404.
+
     Args:
         api_base (str): Base URL of the API.
         auth_header_provider (callable): Function returning a dict with the Authorization header.
@@ -39,7 +45,7 @@ def new_api_context(api_base, auth_header_provider, **opts):
     return {
         "api_base": api_base.rstrip("/"),
         "auth_header_provider": auth_header_provider,
-        "_sess": requests.Session(),
+        "_sess": new_retry_session(),
         "timeout": opts.get("timeout", 30),
     }
 
@@ -8,11 +8,24 @@ Created on Wed May 21 08:52:18 2025
 
 
 import locale
+from importlib.util import find_spec
 from io import BytesIO, TextIOWrapper
 from pathlib import Path
 import pandas as pd
 
 
+# Rust-based reader (python-calamine), much faster than openpyxl; None keeps
+# pandas' default engine when it is not installed.
+EXCEL_ENGINE = 'calamine' if find_spec('python_calamine') else None
+
+# xlsxwriter is a faster writer than openpyxl. URL detection is disabled so
+# text cells are written as-is (no per-string regex, no 65530-URL limit).
+XLSX_WRITER_KWARGS = (
+    {'engine': 'xlsxwriter', 'engine_kwargs': {'options': {'strings_to_urls': False}}}
+    if find_spec('xlsxwriter') else {}
+)
+
+
 def get_csv_separators():
     """
     Determines the appropriate field and decimal separators based on the system locale.
@@ -31,7 +44,7 @@ def get_csv_separators():
     return field_sep, decimal_sep
 
 
-def load_df(file_path, file_format, dtype=None):
+def load_df(file_path, file_format, dtype=None, columns=None):
     """
     Loads a data file into a pandas DataFrame using the specified format.
 
@@ -45,6 +58,8 @@ def load_df(file_path, file_format, dtype=None):
         File format to read ('xlsx' or 'csv').
     dtype : dict or None, optional
         Dictionary specifying column data types to enforce during reading.
+    columns : list or None, optional
+        Subset of columns to read. For parquet only these columns are decoded.
 
     Returns
     -------
@@ -60,14 +75,14 @@ def load_df(file_path, file_format, dtype=None):
 
     if file_format == 'csv':
         field_sep, decimal_sep = get_csv_separators()
-        return pd.read_csv(full_path, dtype=dtype, sep=field_sep,
+        return pd.read_csv(full_path, dtype=dtype, sep=field_sep, usecols=columns,
                            decimal=decimal_sep, encoding='utf-8')
 
     if file_format == 'xlsx':
-        return pd.read_excel(full_path, dtype=dtype)
+        return pd.read_excel(full_path, dtype=dtype, usecols=columns, engine=EXCEL_ENGINE)
 
     if file_format == 'parquet':
-        return pd.read_parquet(full_path, dtype_backend="numpy_nullable")  
+        return pd.read_parquet(full_path, columns=columns, dtype_backend="numpy_nullable")
 
     raise ValueError(f"Unsupported file format: {file_format}")
 
@@ -127,8 +142,9 @@ def save_df(dtfrm, file_path, file_format):
         txt.detach()
         Path(full_path).write_bytes(raw.getvalue())
     elif file_format == 'xlsx':
-        dtfrm.to_excel(full_path, index=False)
+        with pd.ExcelWriter(full_path, **XLSX_WRITER_KWARGS) as writer:
+            dtfrm.to_excel(writer, index=False)
     elif file_format == 'parquet':
-        dtfrm.to_parquet(full_path)
+        dtfrm.to_parquet(full_path, compression='zstd')
     else:
         raise ValueError(f"Unsupported file format: {file_format}")
@@ -7,6 +7,10 @@ Created on Sat May 31 10:37:20 2025
 """
 
 
+import numpy as np
+import pandas as pd
+
+
 def check_puposicao_vs_valorcota(investor_holdings, invested):
     """
     Compares the 'puposicao' field in investor holdings with the 'valor' field 
@@ -29,27 +33,35 @@ def check_puposicao_vs_valorcota(investor_holdings, invested):
         A merged DataFrame including a boolean column 'puposicao_igual_valor' that 
         indicates whether 'puposicao' and 'valor' are equal for each matched row.
     """
-    investor_holdings['original_index'] = investor_holdings.index
-
     cols_invested = ['cnpj', 'valor', 'dtposicao']
 
-    compare_puposicao = investor_holdings.merge(
-        invested[invested['tipo'] == 'valorcota'][cols_invested],
-        left_on=['cnpjfundo', 'dtposicao'],
-        right_on=['cnpj', 'dtposicao'],
-        how='inner'
+    # (cnpj, dtposicao) -> valor da cota; busca por posicao em vez de merge
+    valorcota = (
+        invested.loc[invested['tipo'] == 'valorcota', cols_invested]
+        .drop_duplicates(subset=['cnpj', 'dtposicao'], keep='last')
+        .set_index(['cnpj', 'dtposicao'])['valor']
     )
 
-    compare_puposicao.set_index('original_index', inplace=True)
-
-    decimal_places = 8
-
-    mask_diff = (
-        round(compare_puposicao['puposicao'], decimal_places)
-        != round(compare_puposicao['valor'], decimal_places)
+    keys = pd.MultiIndex.from_arrays(
+        [investor_holdings['cnpjfundo'], investor_holdings['dtposicao']]
+    )
+    positions = valorcota.index.get_indexer(keys)
+    rows = np.flatnonzero(positions >= 0)
+
+    puposicao = investor_holdings['puposicao'].to_numpy(dtype='float64', na_value=np.nan)[rows]
+    valor = valorcota.to_numpy(dtype='float64', na_value=np.nan)[positions[rows]]
+
+    # igualdade ate a 8a casa decimal; nulos em qualquer lado contam como divergencia
+    tolerance = 0.5e-8
+    mask_diff = ~(np.abs(puposicao - valor) <= tolerance)
+    rows = rows[mask_diff]
+
+    return (
+        investor_holdings.iloc[rows]
+        .assign(cnpj=investor_holdings['cnpjfundo'].to_numpy()[rows],
+                valor=valor[mask_diff])
+        .rename_axis('original_index')
     )
-
-    return compare_puposicao.loc[mask_diff]
 
 
 def check_composition_consistency(entity, group_keys, min_pct_diff=0.0):
@@ -93,7 +105,7 @@ def check_composition_consistency(entity, group_keys, min_pct_diff=0.0):
 
     patliq = entity[entity['tipo'] == 'patliq'][group_keys + ['valor_serie']].copy()
 
-    check = total_assets.merge(patliq, on=group_keys, how='left')
+    check = total_assets.merge(patliq, on=group_keys, how='left', validate='one_to_many')
 
     check['diff'] = check['total_invest'] - check['valor_serie']
     check['pct_diff'] = check['diff'] / check['valor_serie']
@@ -7,6 +7,10 @@ Created on Tue Sep 16 09:19:03 2025
 """
 
 
+import numpy as np
+import pandas as pd
+
+
 def create_column_based_on_levels(tree_hrzt, new_col, base_col, deep):
     """
     Creates a new column by filling values from a sequence of level-based columns in cascade order.
@@ -24,16 +28,16 @@ def create_column_based_on_levels(tree_hrzt, new_col, base_col, deep):
     Returns:
         pd.DataFrame: The original DataFrame with the new column added.
     """
-    tree_hrzt[new_col] = None
-    unresolved = tree_hrzt[new_col].isna()
+    cols = [f"{base_col}_nivel_{i}" for i in range(deep, 0, -1)] + [base_col]
+
+    block = tree_hrzt[cols].to_numpy(dtype=object)
+    has_value = pd.notna(block)
+    first = has_value.argmax(axis=1)
 
-    for i in range(deep, -1, -1):
-        suffix = '' if i == 0 else f"_nivel_{i}"
-        col = f"{base_col}{suffix}"
+    values = block[np.arange(len(block)), first]
+    values[~has_value.any(axis=1)] = None
 
-        mask = unresolved & tree_hrzt[col].notna()
-        tree_hrzt.loc[mask, new_col] = tree_hrzt.loc[mask, col]
-        unresolved &= ~mask
+    tree_hrzt[new_col] = pd.Series(values, index=tree_hrzt.index, dtype=object)
 
 
 def fill_level_columns_forward(tree_hrzt, base_col, deep):
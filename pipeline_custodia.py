@@ -31,6 +31,7 @@ def load_config():
     cfg = load_settings('config.ini')
     paths = cfg['paths']
     processing = cfg['processing']
+    aux_loader.configure_excel_cache(paths['cache_path'], processing['cache_max_files'])
 
     return [paths['custodia_path'], paths['destination_path'],
             paths['destination_file_format'],
@@ -347,4 +348,5 @@ def run_pipeline():
 
 
 if __name__ == "__main__":
+    utl.enable_copy_on_write()
     run_pipeline()
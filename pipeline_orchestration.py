@@ -14,7 +14,7 @@ import re
 import multiprocessing
 from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
-import networkx as nx
+from graphlib import CycleError, TopologicalSorter
 import pandas as pd
 from logger import log_timing, RUN_ID
 
@@ -100,7 +100,9 @@ def load_mecsac(mec_source_path, processes):
         )
 
     with log_timing('load', 'load_mecsac_content'):
-        with ProcessPoolExecutor(max_workers=processes) as executor:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=aux_loader.configure_excel_cache,
+                                 initargs=aux_loader.excel_cache_settings()) as executor:
             dfs = list(executor.map(aux_loader.load_mecsac_file,
                                     all_mecsac_files))
 
@@ -317,7 +319,7 @@ def check_values_integrity(log_cfg, entity, entity_name, invested, group_keys):
                               'nome', 'puposicao']
 
     with log_timing('check', f"puposicao_vs_vlcota_{entity_name}") as log:
-        investor_holdings = entity[entity['cnpjfundo'].notnull()][investor_holdings_cols].copy()
+        investor_holdings = entity.loc[entity['cnpjfundo'].notnull(), investor_holdings_cols]
         divergent_puposicao_vlcota = checker.check_puposicao_vs_valorcota(investor_holdings, invested)
 
         if not divergent_puposicao_vlcota.empty:
@@ -394,10 +396,12 @@ def enrich(debug_cfg, funds, portfolios, types_series, data_aux_path, dcadplano,
 
 def compute_metrics(funds, portfolios, types_series):
     with log_timing('compute', 'metrics'):
-        metrics.compute(funds, funds, types_series, ['cnpj'])
+        patliq_lookup = metrics.build_patliq_lookup(funds)
+
+        metrics.compute(funds, patliq_lookup, types_series, ['cnpj'])
 
         group_keys_port = ['cnpjcpf', 'codcart', 'dtposicao', 'nome', 'cnpb']
-        metrics.compute(portfolios, funds, types_series, group_keys_port)
+        metrics.compute(portfolios, patliq_lookup, types_series, group_keys_port)
 
 
 def extract_portfolio_submassa(debug_cfg, cad_submassa, portfolios):
@@ -442,20 +446,16 @@ def validate_fund_graph_is_acyclic(funds):
         ValueError: If a cycle is detected in the graph of fund relationships.
     """
     with log_timing('check', 'acyclic_graph'):
-        edges = (
-            funds[['cnpjfundo', 'cnpj']]
-            .dropna()
-            .drop_duplicates()
-            .values
-            .tolist()
-        )
-        graph = nx.DiGraph()
-        graph.add_edges_from(edges)
+        edges = funds[['cnpjfundo', 'cnpj']].dropna().drop_duplicates()
+
+        sorter = TopologicalSorter()
+        for investor, invested in zip(edges['cnpjfundo'].to_numpy(), edges['cnpj'].to_numpy()):
+            sorter.add(invested, investor)
 
         try:
-            nx.algorithms.dag.topological_sort(graph)
-        except nx.NetworkXUnfeasible as excpt:
-            cycle = nx.find_cycle(graph, orientation='original')
+            sorter.prepare()
+        except CycleError as excpt:
+            cycle = excpt.args[1]
             raise ValueError(f"Cycle detected in fund relationships: {cycle}") from excpt
 
 
@@ -463,7 +463,10 @@ def assign_returns(entity, entity_key, entity_name):
     with log_timing('compute', f"returns_{entity_name}"):
         entity['idinternoativo'] = entity['idinternoativo'].fillna('')
         entity.sort_values(by=entity_key + ['isin', 'idinternoativo', 'dtposicao'], inplace=True)
-        pct = entity.groupby(entity_key + ['isin', 'idinternoativo'])['puposicao'].pct_change(fill_method=None)
+        pct = (
+            entity.groupby(entity_key + ['isin', 'idinternoativo'], sort=False)['puposicao']
+            .pct_change(fill_method=None)
+        )
         entity['rentab'] = pct.round(8)
 
         mask_over = entity['NEW_TIPO'] == 'OVER'
@@ -564,6 +567,7 @@ def load_config():
     cfg = load_settings('config.ini')
     paths = cfg['paths']
     processing = cfg['processing']
+    aux_loader.configure_excel_cache(paths['cache_path'], processing['cache_max_files'])
 
     return [paths['xml_source_path'], paths['destination_path'],
             paths['destination_file_format'],
@@ -696,6 +700,7 @@ def run_pipeline():
     tree_hrztl, tree_hrztl_sub = build_horizontal_tree(debug_cfg, funds, portfolios, port_submassa)
     tree_hrztl_sub = explode_horizontal_tree_submassa(debug_cfg, tree_hrztl_sub, port_submassa)
     tree_hrztl = pd.concat([tree_hrztl, tree_hrztl_sub], ignore_index=True)
+    del tree_hrztl_sub
     #Preenche CODCART com vazio para as demais partes do codigo que passam a usar essa coluna
     #para agregacoes
     tree_hrztl['CODCART'] = tree_hrztl['CODCART'].fillna('')
@@ -707,6 +712,8 @@ def run_pipeline():
                                                 processes, port_submassa)
 
     tree_hrztl = assign_adjustments(tree_hrztl, adjust_rentab)
+    # libera os intermediarios antes de serializar os arquivos finais
+    del adjust_rentab, port_submassa, db_aux
 
     with log_timing('finish', 'save_final_files'):
         save_df(portfolios, destination_path / 'carteiras', destination_file_format)
@@ -715,6 +722,7 @@ def run_pipeline():
 
 
 if __name__ == "__main__":
+    utl.enable_copy_on_write()
     start_time = datetime.now()
     with log_timing('full', 'all_process'):
         run_pipeline()
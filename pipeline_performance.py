@@ -15,6 +15,7 @@ from logger import log_timing, RUN_ID
 from config_loader import load_settings
 import auxiliary_loaders as aux_loader
 import data_access as dta
+import util as utl
 from file_handler import save_df
 
 
@@ -28,6 +29,7 @@ def load_config():
     cfg = load_settings('config.ini')
     paths = cfg['paths']
     processing = cfg['processing']
+    aux_loader.configure_excel_cache(paths['cache_path'], processing['cache_max_files'])
     debug = cfg['debug']
 
     return [paths['destination_path'], paths['destination_file_format'],
@@ -123,7 +125,9 @@ def load_mecsac_last_day_month(mec_sac_path, processes):
         )
 
     with log_timing('load', 'load_mecsac_content') as log:
-        with ProcessPoolExecutor(max_workers=processes) as executor:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=aux_loader.configure_excel_cache,
+                                 initargs=aux_loader.excel_cache_settings()) as executor:
             dfs = list(executor.map(aux_loader.load_mec_sac_last_day_month,
                                     all_mecsac_files))
 
@@ -404,6 +408,7 @@ def run_pipeline():
 
 
 if __name__ == "__main__":
+    utl.enable_copy_on_write()
     #Para evitar mensagem de warning na conversao de datas do dos arquivos de desempenho
     pd.set_option('future.no_silent_downcasting', True)
     with log_timing('full', 'all_process'):
@@ -18,6 +18,7 @@ import pandas as pd
 from config_loader import load_settings
 import auxiliary_loaders as aux_loader
 from file_handler import save_df
+import util as utl
 from data_io import auth_provider as auth, maestro_api as api
 from returns_disclosure import (
     compute_aggregate_returns,
@@ -88,6 +89,7 @@ def load_config():
     """
     cfg = load_settings('config.ini')
     paths = cfg['paths']
+    aux_loader.configure_excel_cache(paths['cache_path'], cfg['processing']['cache_max_files'])
 
     destination_path = paths['destination_path']
     data_aux_path = paths['data_aux_path']
@@ -422,7 +424,9 @@ def load_mec_sac(mec_sac_path):
 
     all_mecsac_files = find_all_mecsac_files(mec_sac_path)
 
-    with ProcessPoolExecutor(max_workers=processes) as executor:
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=aux_loader.configure_excel_cache,
+                             initargs=aux_loader.excel_cache_settings()) as executor:
         dfs = list(executor.map(aux_loader.load_mecsac_file,
                                 all_mecsac_files))
 
@@ -660,4 +664,5 @@ def main():
 
 
 if __name__ == "__main__":
+    utl.enable_copy_on_write()
     main()
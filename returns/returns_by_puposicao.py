@@ -129,7 +129,7 @@ def compute_returns_from_puposicao(range_date, new_data, persisted_returns):
     full_data = generate_position_grid(base, range_date)
     full_data.sort_values(['isin', 'dtposicao'], inplace=True)
 
-    pct = full_data.groupby('isin')['puposicao'].pct_change(fill_method=None)
+    pct = full_data.groupby('isin', sort=False)['puposicao'].pct_change(fill_method=None)
     full_data['rentab'] = pct.round(8)
 
     return full_data[['isin', 'dtposicao', 'puposicao', 'rentab']]
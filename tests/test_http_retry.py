@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retry policy of the data_io HTTP sessions, with the connection pool mocked:
+no request leaves the machine.
+
+Run with: python -m unittest discover -s tests
+"""
+
+
+import io
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import requests
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.response import HTTPResponse
+from urllib3.util.retry import Retry
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_io import auth_provider as auth  # noqa: E402
+from data_io import maestro_api as api  # noqa: E402
+
+
+def _response(status, body=b'{}'):
+    return HTTPResponse(body=io.BytesIO(body), status=status, preload_content=False,
+                        headers={'Content-Type': 'application/json'})
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        # sem espera entre as tentativas
+        patcher = mock.patch.object(Retry, 'sleep')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _mock_pool(self, *statuses, body=b'{}'):
+        responses = [_response(status, body) for status in statuses]
+        patcher = mock.patch.object(HTTPSConnectionPool, '_make_request',
+                                    autospec=True, side_effect=responses)
+        make_request = patcher.start()
+        self.addCleanup(patcher.stop)
+        return make_request
+
+    def _auth_ctx(self):
+        return auth.new_auth_context('tenant', 'client', 'secret', 'scope', timeout=5)
+
+    def test_token_post_retried_after_503(self):
+        token = b'{"access_token": "abc", "expires_in": 3600}'
+        make_request = self._mock_pool(503, 200, body=token)
+
+        header = auth.get_auth_header(self._auth_ctx())
+
+        self.assertEqual(header, {'Authorization': 'Bearer abc'})
+        self.assertEqual(make_request.call_count, 2)
+        self.assertEqual([call.args[2] for call in make_request.call_args_list],
+                         ['POST', 'POST'])
+
+    def test_token_exhausted_retries_raise_http_error(self):
+        make_request = self._mock_pool(503, 503, 503, 503)
+
+        with self.assertRaises(requests.HTTPError) as err:
+            auth.get_auth_header(self._auth_ctx())
+
+        self.assertEqual(err.exception.response.status_code, 503)
+        self.assertEqual(make_request.call_count, 4)
+
+    def test_api_get_retried_after_503(self):
+        make_request = self._mock_pool(503, 200, body=b'[]')
+        ctx = api.new_api_context('https://maestro.example', lambda: {})
+
+        resp = api.api_get(ctx, '/investments/Plans')
+
+        self.assertEqual(resp.json(), [])
+        self.assertEqual(make_request.call_count, 2)
+
+    def test_api_post_not_retried(self):
+        make_request = self._mock_pool(503)
+        ctx = api.new_api_context('https://maestro.example', lambda: {})
+
+        with self.assertRaises(RuntimeError):
+            api.api_post(ctx, '/investments/Plans', json={})
+
+        self.assertEqual(make_request.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
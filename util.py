@@ -11,6 +11,7 @@ import time
 import os
 import warnings
 from configparser import ConfigParser
+import pandas as pd
 from colorama import init, Fore, Style
 
 
@@ -52,6 +53,16 @@ def format_path(str_path):
     return str_path
 
 
+def enable_copy_on_write():
+    """
+    Enables pandas Copy-on-Write for the current process, so filtered slices
+    share memory with their source until modified. pandas >= 3 always runs in
+    this mode and deprecates the option, so it is only set on 2.x.
+    """
+    if int(pd.__version__.split('.', maxsplit=1)[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+
 def log_message(msg, level='info'):
     """
     Prints a formatted message to the terminal based on the specified severity level.